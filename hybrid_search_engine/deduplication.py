@@ -0,0 +1,230 @@
+import hashlib
+import logging
+import re
+from typing import List
+
+import numpy as np
+
+from hybrid_search_engine.model.document import Document, content_digest
+
+log = logging.getLogger(__name__)
+
+# Mersenne prime used as modulus for the MinHash permutations
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class MinHashLSH:
+    """
+    Near-duplicate detection with MinHash signatures over word shingles, bucketed with LSH bands.
+    Two texts are near-duplicates if the estimated Jaccard similarity of their shingles is >= threshold.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, bands: int = 32, shingle_size: int = 5, seed: int = 1):
+        assert 0.0 < threshold <= 1.0, "threshold must be in (0, 1]"
+        assert num_perm % bands == 0, "num_perm must be divisible by bands"
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # fixed seed, so signatures are stable between processes
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._buckets = [dict() for _ in range(bands)]
+        self._signatures = []
+        self._keys = []
+
+    def _shingles(self, text: str):
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        if not tokens:
+            return set()
+        if len(tokens) <= self.shingle_size:
+            return {" ".join(tokens)}
+        return {" ".join(tokens[i:i + self.shingle_size]) for i in range(len(tokens) - self.shingle_size + 1)}
+
+    def signature(self, shingles: set):
+        """
+        MinHash signature of a set of shingles, vectorized over shingles and permutations
+        (uint64 arithmetic wraps around, as in datasketch).
+        :param shingles:
+        :return:
+            array of shape (num_perm,)
+        """
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles),
+            dtype=np.uint64, count=len(shingles),
+        )
+        permuted = np.bitwise_and((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME, _MAX_HASH)
+        return permuted.min(axis=0)
+
+    def _bands_of(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _similarity(self, sig_a, sig_b):
+        return np.count_nonzero(sig_a == sig_b) / self.num_perm
+
+    def find_duplicate(self, text: str, key=None, add: bool = True):
+        """
+        Look for a near-duplicate of the text among the texts already seen.
+        :param text:
+        :param key: identifier stored with the text, returned when a later text matches it
+        :param add: if True and the text is not a duplicate, store it for the next checks
+        :return:
+            key of the near-duplicate already seen, or None. Texts without word tokens are never near-duplicates
+        """
+        shingles = self._shingles(text)
+        if not shingles:
+            return None
+
+        signature = self.signature(shingles)
+        bands = self._bands_of(signature)
+
+        candidates = set()
+        for bucket, band in zip(self._buckets, bands):
+            candidates.update(bucket.get(band, ()))
+
+        for candidate in sorted(candidates):
+            if self._similarity(signature, self._signatures[candidate]) >= self.threshold:
+                return self._keys[candidate]
+
+        if add:
+            idx = len(self._signatures)
+            self._signatures.append(signature)
+            self._keys.append(key)
+            for bucket, band in zip(self._buckets, bands):
+                bucket.setdefault(band, []).append(idx)
+
+        return None
+
+
+class Deduplicator:
+    """
+    Filter out exact duplicates (same content digest) and, optionally, near-duplicates (MinHash LSH)
+    before documents are embedded and indexed. Keeps running counts to report the deduplication ratio.
+    The id of a dropped document is mapped to the id of the document kept in its place (see resolve_id).
+    """
+
+    def __init__(self, near_duplicate_threshold: float = None):
+        self._seen_digests = {}
+        self.aliases = {}
+        self.near_duplicates = MinHashLSH(threshold=near_duplicate_threshold) if near_duplicate_threshold is not None else None
+
+        self.n_seen = 0
+        self.n_exact_duplicates = 0
+        self.n_near_duplicates = 0
+
+    @property
+    def n_duplicates(self):
+        return self.n_exact_duplicates + self.n_near_duplicates
+
+    @property
+    def deduplication_ratio(self):
+        """Fraction of the documents seen so far that were dropped as duplicates."""
+        return self.n_duplicates / self.n_seen if self.n_seen else 0.0
+
+    def resolve_id(self, doc_id):
+        """Id of the indexed document that stands for doc_id (doc_id itself if it was not dropped)."""
+        return self.aliases.get(doc_id, doc_id)
+
+    def filter(self, documents: List[Document]) -> List[Document]:
+        """
+        Return the documents that are not duplicates of each other or of any document seen before.
+        :param documents:
+        :return:
+            list of unique documents, in the original order
+        """
+        unique_docs = []
+        n_exact, n_near = 0, 0
+
+        for doc in documents:
+            text = doc.get_searchable_text()
+            digest = content_digest(text)
+
+            kept_id = self._seen_digests.get(digest)
+            if kept_id is not None:
+                n_exact += 1
+                self._drop(doc, kept_id, "exact duplicate")
+                continue
+
+            if self.near_duplicates is not None:
+                kept_id = self.near_duplicates.find_duplicate(text, key=doc.id)
+                if kept_id is not None:
+                    n_near += 1
+                    self._drop(doc, kept_id, "near-duplicate")
+                    continue
+
+            self._seen_digests[digest] = doc.id
+            # a kept document reusing the id of a dropped one is indexed under its own id
+            self.aliases.pop(doc.id, None)
+            unique_docs.append(doc)
+
+        self.n_seen += len(documents)
+        self.n_exact_duplicates += n_exact
+        self.n_near_duplicates += n_near
+
+        if documents:
+            log.info(f"Deduplication: kept {len(unique_docs)}/{len(documents)} documents "
+                     f"({n_exact} exact duplicates, {n_near} near-duplicates), "
+                     f"ratio {(n_exact + n_near) / len(documents):.2%}. Overall ratio: {self.deduplication_ratio:.2%}")
+
+        return unique_docs
+
+    def _drop(self, doc: Document, kept_id, reason: str):
+        log.debug(f"Dropping document {doc.id}: {reason} of document {kept_id}")
+        if doc.id != kept_id:
+            self.aliases[doc.id] = kept_id
+
+
+if __name__ == "__main__":
+    import os
+    import subprocess
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+
+    text = " ".join(f"word{i}" for i in range(200))
+    near_text = text.replace("word100 ", "changed ")  # 5 of 196 shingles change: Jaccard ~0.95
+    far_text = text.replace("word50 ", "changed ").replace("word100 ", "changed ").replace("word150 ", "changed ")  # Jaccard ~0.86
+
+    # exact duplicates are dropped across separate filter calls, and their ids resolve to the kept document
+    deduplicator = Deduplicator()
+    assert [d.id for d in deduplicator.filter([Document(id="1", content=text), Document(id="2", content="other")])] == ["1", "2"]
+    assert deduplicator.filter([Document(id="3", content=text), Document(content="other")]) == []
+    assert deduplicator.resolve_id("3") == "1"
+    assert deduplicator.resolve_id("1") == "1"
+
+    # reusing the id of a dropped document for new content indexes it under its own id again
+    assert [d.id for d in deduplicator.filter([Document(id="3", content="entirely different")])] == ["3"]
+    assert deduplicator.resolve_id("3") == "3"
+
+    # deduplication ratio accumulates across calls: 2 dropped out of 5
+    assert deduplicator.deduplication_ratio == 2 / 5
+    deduplicator.filter([Document(content="new")])
+    assert deduplicator.deduplication_ratio == 2 / 6
+
+    # near-duplicate threshold: accepted above it, rejected below it
+    deduplicator = Deduplicator(near_duplicate_threshold=0.9)
+    deduplicator.filter([Document(id="orig", content=text)])
+    assert deduplicator.filter([Document(id="near", content=near_text)]) == []
+    assert deduplicator.resolve_id("near") == "orig"
+    assert [d.id for d in deduplicator.filter([Document(id="far", content=far_text)])] == ["far"]
+
+    # texts without word tokens are never near-duplicates
+    assert len(deduplicator.filter([Document(content="!!!"), Document(content="???")])) == 2
+
+    # content digests are the same across processes, whatever the hash seed
+    digests = {
+        subprocess.run(
+            [sys.executable, "-c", "from hybrid_search_engine.model.document import content_digest; print(content_digest('stable'))"],
+            env={**os.environ, "PYTHONHASHSEED": seed}, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        for seed in ("1", "2", "random")
+    }
+    assert digests == {content_digest("stable")}
+
+    print("All deduplication checks passed")
@@ -1,16 +1,25 @@
-import os
+import hashlib
+
+
+def content_digest(content: str) -> str:
+    """
+    Stable digest of the content, the same across processes (unlike the builtin hash()).
+    :param content:
+    :return:
+        hex digest (blake2b, 16 bytes)
+    """
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
 
 
 class Document:
     def __init__(self,  id = None, content = "", title = "", metadata:dict = None):
-        # set PYTHONHASHSEED=0 to make hash deterministic
-        os.environ["PYTHONHASHSEED"] = "0"
-        self.id = id if id is not None else hash(content)
+        assert content is not None and content != "", "Document content cannot be empty"
+
         self.title = title
         self.content = content
         self.metadata = metadata or {}
-
-        assert self.content is not None and self.content != "", "Document content cannot be empty"
+        # same key used by the Deduplicator for exact duplicates
+        self.id = id if id is not None else content_digest(self.get_searchable_text())
 
     def get_searchable_text(self):
         return (self.title + "\n" + self.content).strip()
@@ -27,4 +36,4 @@ class Document:
     def __hash__(
         self,
     ):
-        return hash(self.id)
\ No newline at end of file
+        return hash(self.id)
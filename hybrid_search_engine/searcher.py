@@ -2,6 +2,7 @@ import logging
 import os
 from typing import List
 
+from hybrid_search_engine.deduplication import Deduplicator
 from hybrid_search_engine.model.document import Document
 from hybrid_search_engine.retrievers import BM25Retriever, FaissRetriever
 from hybrid_search_engine.rank_fusion import reciprocal_rank_fusion
@@ -14,13 +15,20 @@ log = logging.getLogger(__name__)
 
 
 class HybridSearch:
-    def __init__(self, documents: list, hybrid_search_active: bool = False, language: str = None, reranker: str = "inhouse", embedding_model: str = "openai"):
+    def __init__(self, documents: list, hybrid_search_active: bool = False, language: str = None, reranker: str = "inhouse", embedding_model: str = "openai",
+                 deduplicate: bool = True, near_duplicate_threshold: float = None):
+        assert deduplicate or near_duplicate_threshold is None, "near_duplicate_threshold requires deduplicate=True"
         self.hybrid_search_active = hybrid_search_active
 
         if len(documents) > 0 and isinstance(documents[0], str):
-            log.info("Converting list of strings to list of Documents. Id will be hash(content), no title, no metadata.")
+            log.info("Converting list of strings to list of Documents. Id will be the content digest, no title, no metadata.")
             documents = [Document(content=doc) for doc in documents]
 
+        # Skip exact duplicates (and near-duplicates, if a threshold is given) before embedding and indexing
+        self.deduplicator = Deduplicator(near_duplicate_threshold=near_duplicate_threshold) if deduplicate else None
+        if self.deduplicator is not None:
+            documents = self.deduplicator.filter(documents)
+
         self.documents: List[Document] = documents
 
         log.info(f"hybrid_search_active: {hybrid_search_active}")
@@ -44,9 +52,15 @@ class HybridSearch:
     def add_documents(self, new_docs: list):
 
         if len(new_docs) > 0 and isinstance(new_docs[0], str):
-            log.info("Converting list of strings to list of Documents. Id will be hash(content), no title, no metadata.")
+            log.info("Converting list of strings to list of Documents. Id will be the content digest, no title, no metadata.")
             new_docs = [Document(content=doc) for doc in new_docs]
 
+        if self.deduplicator is not None:
+            new_docs = self.deduplicator.filter(new_docs)
+            if len(new_docs) == 0:
+                log.info("No new documents to add after deduplication")
+                return
+
         log.info(f"Adding {len(new_docs)} documents to the index... Previous number of documents: {len(self.documents)}")
 
         self.documents += new_docs
@@ -86,6 +100,10 @@ class HybridSearch:
         return self.get_documents_from_ids(results_ids)[:rows], scores[:rows]
 
     def get_documents_from_ids(self, doc_ids):
+        if self.deduplicator is not None:
+            # ids of documents dropped at ingest resolve to the document kept in their place
+            doc_ids = [self.deduplicator.resolve_id(doc_id) for doc_id in doc_ids]
+
         list_docs = []
         for doc_id in doc_ids:
             for doc in self.documents: